@@ -1,5 +1,6 @@
 """Face detection pipe element."""
 import logging
+import numpy as np
 
 from .image_detection import TFImageDetection
 
@@ -11,7 +12,17 @@ class FaceDetector(TFImageDetection):
 
     @staticmethod
     def crop_image(image, box):
-        """Crop image to given box."""
+        """Crop image to given box.
+
+        Numpy array images are cropped to a view without copying.
+        """
+        if isinstance(image, np.ndarray):
+            height, width = image.shape[:2]
+            left = max(round(box[0]*width), 0)
+            top = max(round(box[1]*height), 0)
+            right = max(round(box[2]*width), 0)
+            bottom = max(round(box[3]*height), 0)
+            return image[top:bottom, left:right]
         # Size of the image in pixels (size of orginal image)
         # (This is not mandatory)
         width, height = image.size
@@ -38,6 +49,9 @@ class FaceDetector(TFImageDetection):
         else:
             try:
                 image = sample['image']
+                if isinstance(image, (bytes, bytearray)):
+                    # decode JPEG once for all person crops
+                    image = self.decode(buf=image)
                 prev_inference_result = sample.get('inference_result', None)
                 log.debug("Received sample with inference_result: %s",
                           str(prev_inference_result))
@@ -53,10 +67,13 @@ class FaceDetector(TFImageDetection):
                             person_regions.append(box)
                     log.debug('Received %d person boxes for face detection',
                               len(person_regions))
-                    for box in person_regions:
-                        person_image = self.crop_image(image, box)
+                    person_images = [self.crop_image(image, box)
+                                     for box in person_regions]
+                    detections = self.detect_batch(images=person_images)
+                    for person_image, detection in zip(person_images,
+                                                       detections):
                         thumbnail, tensor_image, inference_result = \
-                            self.detect(image=person_image)
+                            detection
                         log.debug('Face detection inference_result: %r',
                                   inference_result)
                         inf_meta = {
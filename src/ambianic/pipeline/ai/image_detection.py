@@ -1,16 +1,132 @@
 """Tensorflow image detection wrapper."""
+import functools
 import logging
+import math
 import time
 import re
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 import numpy as np
 # from importlib import import_module
-from PIL import ImageOps
+from PIL import Image, ImageOps
 from .inference import TFInferenceEngine
 from ambianic.pipeline import PipeElement
 
+# OpenCV is optional. It speeds up resizing of numpy array images.
+try:
+    import cv2
+except ImportError:  # pragma: no cover
+    cv2 = None
+
+# Numba is optional. It compiles detection postprocessing to native code.
+try:
+    import numba
+except ImportError:  # pragma: no cover
+    numba = None
 
 log = logging.getLogger(__name__)
 
+# one label per line: integer code followed by label text
+_LABEL_LINE = re.compile(r'^\s*(\d+)(.+)$', re.MULTILINE)
+
+# log inference stats at most once per interval in seconds
+_LOG_STATS_INTERVAL = 1.0
+
+
+@functools.lru_cache(maxsize=None)
+def _get_turbojpeg():
+    # PyTurboJPEG is optional and requires the native libturbojpeg
+    try:
+        from turbojpeg import TurboJPEG
+        return TurboJPEG()
+    except Exception as e:
+        log.debug('TurboJPEG not available. Will use PIL to decode JPEG: %r',
+                  e)
+        return None
+
+
+def _jit(func):
+    """Compile func to native code with Numba when available."""
+    if numba:
+        return numba.njit(cache=True)(func)
+    return func  # pragma: no cover
+
+
+@_jit
+def _postprocess(boxes,
+                 label_codes,
+                 scores,
+                 detections_count,
+                 top_k,
+                 confidence_threshold,
+                 w_factor,
+                 h_factor):
+    """Select the top_k detections of one image above the threshold.
+
+    :Returns:
+    -------
+    (label_codes, confidences, boxes)
+        Integer label codes, confidence scores and (y0, x0, y1, x1) boxes
+        refit into the original image size, ordered from highest
+        to lowest confidence.
+
+    """
+    # We are only interested in scores within detections_count range
+    scores = scores[:detections_count]
+    n = len(scores)
+    k = min(top_k, n)
+    # get a list of indices for the top_k results
+    # ordered from highest to lowest confidence.
+    # Partition out the top_k scores in linear time
+    # and sort only those.
+    if k > 0:
+        top_k_indices = np.argpartition(scores, n - k)[n - k:]
+    else:
+        top_k_indices = np.zeros(0, dtype=np.intp)
+    top_k_indices = top_k_indices[np.argsort(scores[top_k_indices])[::-1]]
+    confidences = scores[top_k_indices]
+    # from the top_k results, only take the ones that score
+    # above the confidence threshold criteria.
+    mask = confidences >= confidence_threshold
+    selected = top_k_indices[mask]
+    selected_labels = label_codes[selected].astype(np.int64)
+    # refit detections (y0, x0, y1, x1) into original image size
+    # without overflowing outside image borders
+    selected_boxes = boxes[selected] / \
+        np.array((h_factor, w_factor, h_factor, w_factor))
+    selected_boxes[:, 2:] = np.minimum(selected_boxes[:, 2:], 1.0)
+    return selected_labels, confidences[mask], selected_boxes
+
+
+def _thumbnail_size(img_w, img_h, width, height):
+    """Return the size PIL.Image.thumbnail would scale (img_w, img_h) to.
+
+    Preserves the aspect ratio as closely as whole pixels allow
+    with the same rounding as Pillow. Never enlarges the image.
+    """
+    if width >= img_w and height >= img_h:
+        return img_w, img_h
+
+    def round_aspect(number, key):
+        return max(min(math.floor(number), math.ceil(number), key=key), 1)
+
+    aspect = img_w / img_h
+    if width / height >= aspect:
+        width = round_aspect(height * aspect,
+                             key=lambda n: abs(aspect - n / height))
+    else:
+        height = round_aspect(
+            width / aspect,
+            key=lambda n: 0 if n == 0 else abs(aspect - width / n))
+    return width, height
+
+
+def _image_size(image=None):
+    """Return (width, height) of a PIL.Image or a HxWxC numpy array."""
+    if isinstance(image, np.ndarray):
+        return image.shape[1], image.shape[0]
+    return image.size
+
 
 class TFImageDetection(PipeElement):
     """Applies Tensorflow image detection."""
@@ -20,6 +136,8 @@ class TFImageDetection(PipeElement):
                  labels=None,
                  confidence_threshold=0.6,
                  top_k=3,
+                 delegate=None,
+                 allow_float=False,
                  **kwargs
                  ):
         """Initialize detector with config parameters.
@@ -30,6 +148,11 @@ class TFImageDetection(PipeElement):
         labels: ai_models/coco_labels.txt
         confidence_threshold: 0.6
         top_k: 3
+        delegate: edgetpu
+        allow_float: False
+            Floating point models are not tested thoroughly
+            and are rejected unless explicitly allowed.
+            Quantized models are recommended.
 
         """
         # log.warning('TFImageDetection __init__ invoked')
@@ -39,9 +162,65 @@ class TFImageDetection(PipeElement):
             model=model,
             labels=labels,
             confidence_threshold=confidence_threshold,
-            top_k=top_k)
+            top_k=top_k,
+            delegate=delegate)
+        # uint8 models take pixel values as they are,
+        # float32 models take normalized pixel values.
+        # The input tensor view would silently wrap around
+        # uint8 pixel values that do not fit any other type.
+        input_dtype = self._tfengine.input_details[0]['dtype']
+        if input_dtype == np.float32:
+            if not allow_float:
+                raise NotImplementedError(
+                    'Floating point AI models are not supported. '
+                    'Use a quantized model or set allow_float: True')
+        elif input_dtype != np.uint8:
+            raise NotImplementedError(
+                'AI model input type {} is not supported. '
+                'Use a uint8 quantized model.'.format(
+                    np.dtype(input_dtype).name))
         self._labels = self.load_labels(self._tfengine.labels_path)
-        self.last_time = time.monotonic()
+        # label codes are dense integers starting at 0,
+        # index them directly instead of hashing dict keys
+        self._labels_arr = tuple(
+            self._labels.get(i, None)
+            for i in range(max(self._labels, default=-1) + 1))
+        self._stats_log_time = time.monotonic()
+        self._stats_frames = 0
+        self._preprocess_executor = None
+        # cache model constants needed for each sample
+        tfe = self._tfengine
+        # NxHxWxC, H:1, W:2
+        input_shape = tfe.input_details[0]['shape']
+        self._in_h = int(input_shape[1])
+        self._in_w = int(input_shape[2])
+        self._in_idx = tfe.input_details[0]['index']
+        self._out_idx = tuple(od['index'] for od in tfe.output_details)
+        # zero-copy access to the input and output tensor buffers
+        self._input_tensor = tfe.tensor(self._in_idx)
+        self._output_tensors = tuple(tfe.tensor(i) for i in self._out_idx)
+        self._postprocess = _postprocess
+        if numba:
+            # compile postprocessing for the model output types now
+            # instead of delaying the first inference
+            boxes, label_codes, scores, _ = (
+                np.zeros(od['shape'][1:], dtype=od['dtype'])
+                for od in tfe.output_details)
+            try:
+                _postprocess(boxes, label_codes, scores, 0,
+                             tfe.top_k, tfe.confidence_threshold, 1.0, 1.0)
+            except Exception as e:
+                log.warning('Numba failed to compile detection '
+                            'postprocessing. Will use plain Python: %r', e)
+                self._postprocess = _postprocess.py_func
+        self._norm_lut = None
+        if input_dtype == np.float32:
+            # lookup table mapping each of the 256 possible pixel values
+            # to its normalized float value: (x - mean) / std
+            input_mean = 127.5
+            input_std = 127.5
+            self._norm_lut = \
+                (np.arange(256, dtype=np.float32) - input_mean) / input_std
 
     def load_labels(self, label_path=None):
         """Load label mapping from integer code to text.
@@ -58,10 +237,9 @@ class TFImageDetection(PipeElement):
 
         """
         assert label_path
-        p = re.compile(r'\s*(\d+)(.+)')
         with open(label_path, 'r', encoding='utf-8') as f:
-            lines = (p.match(line).groups() for line in f.readlines())
-            return {int(num): text.strip() for num, text in lines}
+            lines = _LABEL_LINE.findall(f.read())
+        return {int(num): text.strip() for num, text in lines}
 
     def thumbnail(self, image=None, desired_size=None):
         """Resizes original image as close as possible to desired size.
@@ -86,25 +264,9 @@ class TFImageDetection(PipeElement):
         assert image
         assert desired_size
         log.debug('input image size = %r', image.size)
-        thumb = image.copy()
         w, h = desired_size
-        try:
-            # convert from numpy to native Python int type
-            # that PIL expects
-            if isinstance(w, np.generic):
-                w = w.item()
-                w = int(w)
-                h = h.item()
-                h = int(h)
-            thumb.thumbnail((w, h))
-        except Exception as e:
-            msg = (f"Exception in "
-                   f"PIL.image.thumbnail(desired_size={desired_size}):"
-                   f"type(width)={type(w)}, type(height)={type(h)}"
-                   f"\n{e}"
-                   )
-            log.exception(msg)
-            raise RuntimeError(msg)
+        # resize() returns a new image, no need to copy the original
+        thumb = self._fit_image(image=image, width=w, height=h)
         log.debug('thmubnail image size = %r', thumb.size)
         return thumb
 
@@ -137,37 +299,170 @@ class TFImageDetection(PipeElement):
         assert image
         assert desired_size
         log.debug('input image size = %r', image.size)
-        thumb = image.copy()
-        delta_w = desired_size[0] - thumb.size[0]
-        delta_h = desired_size[1] - thumb.size[1]
+        delta_w = desired_size[0] - image.size[0]
+        delta_h = desired_size[1] - image.size[1]
         padding = (0, 0, delta_w, delta_h)
-        new_im = ImageOps.expand(thumb, padding)
+        # expand() returns a new image, no need to copy the original
+        new_im = ImageOps.expand(image, padding)
         log.debug('new image size = %r', new_im.size)
         assert new_im.size == desired_size
         return new_im
 
-    def _log_stats(self, start_time=None):
+    def decode(self, buf=None):
+        """Decode a JPEG encoded image.
+
+        Uses TurboJPEG when available, which is considerably faster than
+        PIL at decoding JPEG. Falls back to PIL otherwise.
+
+        :Parameters:
+        ----------
+        buf : bytes
+            JPEG encoded image.
+
+        :Returns:
+        -------
+        numpy.ndarray
+            Decoded image in raw RGB format with HxWx3 uint8 layout.
+
+        """
+        assert buf
+        jpeg = _get_turbojpeg()
+        if jpeg:
+            from turbojpeg import TJPF_RGB
+            return jpeg.decode(buf, pixel_format=TJPF_RGB)
+        with Image.open(BytesIO(buf)) as image:
+            return np.asarray(image.convert('RGB'))
+
+    @staticmethod
+    def _fit_image(image=None, width=None, height=None):
+        """Scale image down proportionally to fit within width, height.
+
+        Same as PIL.Image.thumbnail, but returns a new image
+        instead of modifying the original in place.
+        Returns the original image if it already fits.
+        Supports both PIL.Image and HxWx3 numpy array images.
+        """
+        # convert from numpy to native Python int type that PIL expects
+        width = int(width)
+        height = int(height)
+        img_w, img_h = _image_size(image)
+        new_w, new_h = _thumbnail_size(img_w, img_h, width, height)
+        if (new_w, new_h) == (img_w, img_h):
+            return image
+        if isinstance(image, np.ndarray):
+            if cv2:
+                # Bilinear is the fastest OpenCV filter and good enough
+                # for mild downscaling. It skips source pixels and aliases
+                # when shrinking more than 2x, where area averaging
+                # gives the AI model a much closer image.
+                if new_w / img_w > 0.5:
+                    interpolation = cv2.INTER_LINEAR
+                else:
+                    interpolation = cv2.INTER_AREA
+                return cv2.resize(image, (new_w, new_h),
+                                  interpolation=interpolation)
+            image = Image.fromarray(image)
+            return np.asarray(image.resize((new_w, new_h), Image.BICUBIC,
+                                           reducing_gap=2.0))
+        # Same resampling as PIL.Image.thumbnail
+        # to keep detection results consistent.
+        # OpenCV resampling shifts face detection confidence enough
+        # to change results, therefore PIL images stay with PIL.
+        return image.resize((new_w, new_h), Image.BICUBIC, reducing_gap=2.0)
+
+    def _prepare_input(self, image=None, width=None, height=None):
+        """Fit image into the exact input tensor size in one pass.
+
+        Scales the image down proportionally so that it fits
+        within (width, height) and copies it in the top left corner
+        of a black canvas with the exact input tensor size.
+        Does not modify the original image.
+
+        :Parameters:
+        ----------
+        image : PIL.Image, numpy.ndarray or bytes
+            Input Image for AI model detection. JPEG encoded bytes
+            are decoded and processed as a HxWx3 numpy array.
+
+        width, height : int
+            Exact size expected by the AI model input tensor.
+
+        :Returns:
+        -------
+        (PIL.Image or numpy.ndarray, numpy.ndarray)
+            The proportionately resized image of the same type as the
+            input image and the padded HxWx3 image fitting exactly
+            the AI model input tensor.
+
+        """
+        assert image is not None
+        if isinstance(image, (bytes, bytearray)):
+            image = self.decode(buf=image)
+        if isinstance(image, np.ndarray):
+            assert image.ndim == 3 and image.shape[2] == 3, \
+                'Expected HxWx3 RGB image, got shape {}'.format(image.shape)
+            assert image.dtype == np.uint8, \
+                'Expected uint8 RGB image, got {}'.format(image.dtype)
+        # convert from numpy to native Python int type that PIL expects
+        width = int(width)
+        height = int(height)
+        resized = self._fit_image(image=image, width=width, height=height)
+        if isinstance(resized, np.ndarray):
+            resized_data = resized
+        elif resized.mode == 'RGB':
+            resized_data = np.asarray(resized)
+        else:
+            resized_data = np.asarray(resized.convert('RGB'))
+        new_h, new_w = resized_data.shape[:2]
+        # pad with black pixels to the exact input tensor size.
+        # Only the padding area needs to be zeroed.
+        canvas = np.empty((height, width, 3), dtype=np.uint8)
+        canvas[:new_h, :new_w] = resized_data
+        canvas[new_h:] = 0
+        canvas[:new_h, new_w:] = 0
+        log.debug('input image size = %r, resized image size = %r',
+                  _image_size(image), _image_size(resized))
+        return resized, canvas
+
+    def stop(self):
+        """Release the image preprocessing thread."""
+        super().stop()
+        if self._preprocess_executor:
+            self._preprocess_executor.shutdown(wait=False)
+            self._preprocess_executor = None
+
+    def _log_stats(self, start_time=None, frames=1):
         assert start_time
         log.debug("TF engine returned inference results")
         end_time = time.monotonic()
+        # a batch inference processes several frames at once
+        self._stats_frames += frames
+        # keep log formatting and IO off the per frame path
+        elapsed = end_time - self._stats_log_time
+        if elapsed < _LOG_STATS_INTERVAL or not log.isEnabledFor(logging.INFO):
+            return
         inf_time = (end_time - start_time) * 1000
-        fps = 1.0/(end_time - self.last_time)
+        # average fps since the previous stats log
+        fps = self._stats_frames / elapsed
         if self.context and self.context.unique_pipeline_name:
             pipeline_name = self.context.unique_pipeline_name
         else:
             pipeline_name = 'unknown'
         inf_info = 'Inference time %.2f ms, %.2f fps in pipeline %s'
         log.info(inf_info, inf_time, fps, pipeline_name)
-        self.last_time = end_time
+        self._stats_log_time = end_time
+        self._stats_frames = 0
 
     def detect(self, image=None):
         """Detect objects in image.
 
         :Parameters:
         ----------
-        image : PIL.Image
-            Input image in raw RGB format
-            with the exact size of the input tensor.
+        image : PIL.Image, numpy.ndarray or bytes
+            Input image in raw RGB format.
+            Numpy arrays are expected in HxWx3 uint8 layout
+            and are processed without conversion to PIL.
+            JPEG encoded bytes are decoded with decode().
 
         :Returns:
         -------
@@ -177,113 +472,217 @@ class TFImageDetection(PipeElement):
             (label, confidence, (x0, y0, x1, y1))
 
         """
-        assert image
+        assert image is not None
         start_time = time.monotonic()
-        log.debug("Calling TF engine for inference")
+        # detect_batch() may have resized the input tensor
+        self._tfengine.resize_batch(batch_size=1)
+        prepared = self._preprocess(image=image)
+        return self._detect_prepared(prepared=[prepared],
+                                     start_time=start_time)[0]
 
-        tfe = self._tfengine
+    def detect_batch(self, images=None):
+        """Detect objects in a batch of images with a single inference.
 
-        # NxHxWxC, H:1, W:2
-        height = tfe.input_details[0]['shape'][1]
-        width = tfe.input_details[0]['shape'][2]
+        Falls back to detecting images one at a time via detect_all()
+        if the AI model does not support the batch size.
 
-        # thumbnail is a proportionately resized image
-        thumbnail = self.thumbnail(image=image, desired_size=(width, height))
+        :Parameters:
+        ----------
+        images : Iterable[PIL.Image, numpy.ndarray or bytes]
+            Input images in raw RGB format, same as detect().
 
-        # convert thumbnail into an image with the exact size
-        # as the input tensor
-        # preserving proportions by padding as needed
-        new_im = self.resize(image=thumbnail, desired_size=(width, height))
+        :Returns:
+        -------
+        list of tuples
+            One (thumbnail, tensor_image, inference_result)
+            tuple per input image, in the same order as detect().
+
+        """
+        assert images is not None
+        images = list(images)
+        if not images:
+            return []
+        if not self._tfengine.resize_batch(batch_size=len(images)):
+            log.debug('AI model does not support batch size %d. '
+                      'Will detect one image at a time.',
+                      len(images))
+            return list(self.detect_all(images=images))
+        start_time = time.monotonic()
+        if len(images) == 1:
+            prepared = [self._preprocess(image=images[0])]
+        else:
+            executor = self._get_preprocess_executor()
+            prepared = list(executor.map(self._preprocess, images))
+        return self._detect_prepared(prepared=prepared,
+                                     start_time=start_time)
+
+    def detect_all(self, images=None):
+        """Detect objects in a sequence of images.
+
+        Prepares the next image for the input tensor in a background
+        thread while inference runs on the current image.
+        The TFLite interpreter is not thread safe, therefore inference
+        itself always runs on the calling thread.
+
+        :Parameters:
+        ----------
+        images : Iterable[PIL.Image, numpy.ndarray or bytes]
+            Input images in raw RGB format, same as detect().
+
+        :Returns:
+        -------
+        Iterable[tuple]
+            Generates one (thumbnail, tensor_image, inference_result)
+            tuple per input image, in the same order as detect().
+
+        """
+        assert images is not None
+        images = iter(images)
+        image = next(images, None)
+        if image is None:
+            return
+        self._tfengine.resize_batch(batch_size=1)
+        executor = self._get_preprocess_executor()
+        pending = executor.submit(self._preprocess, image=image)
+        for image in images:
+            prepared = pending.result()
+            pending = executor.submit(self._preprocess, image=image)
+            yield self._detect_prepared(prepared=[prepared],
+                                        start_time=time.monotonic())[0]
+        yield self._detect_prepared(prepared=[pending.result()],
+                                    start_time=time.monotonic())[0]
+
+    def _get_preprocess_executor(self):
+        if not self._preprocess_executor:
+            self._preprocess_executor = ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix=self.__class__.__name__)
+        return self._preprocess_executor
+
+    def _preprocess(self, image=None):
+        """Prepare image for the input tensor.
+
+        Does not touch the TFLite interpreter,
+        therefore safe to run in a separate thread.
+
+        :Returns:
+        -------
+        tuple
+            (thumbnail, new_im, w_factor, h_factor)
+
+        """
+        assert image is not None
+        # thumbnail is a proportionately resized image,
+        # new_im is the thumbnail padded to the exact size
+        # of the input tensor
+        thumbnail, new_im = self._prepare_input(
+            image=image, width=self._in_w, height=self._in_h)
 
         # calculate what fraction of the new image is the thumbnail size
         # we will use these factors to adjust detection box coordinates
-        w_factor = thumbnail.size[0] / new_im.size[0]
-        h_factor = thumbnail.size[1] / new_im.size[1]
-
-        # add N dim
-        input_data = np.expand_dims(new_im, axis=0)
-        # log.warning('input_data.shape: %r', input_data.shape)
-        # log.warning('input_data.dtype: %r', input_data.dtype)
-        # input_data = input_data.astype(np.uint8)
-        # log.warning('input_data.dtype: %r', input_data.dtype)
-        # input_data = np.asarray(input_data).flatten()
-
-        # Note: Floating models are not tested thoroughly yet.
-        # Its not clear yet whether floating models will be a good fit
-        # for Ambianic use cases. Optimized quantized models seem to do
-        # a good job in terms of accuracy and speed.
-        if not tfe.is_quantized:  # pragma: no cover
-            # normalize floating point values
-            input_mean = 127.5
-            input_std = 127.5
-            input_data = \
-                (np.float32(input_data) - input_mean) / input_std
+        thumb_w, thumb_h = _image_size(thumbnail)
+        w_factor = thumb_w / self._in_w
+        h_factor = thumb_h / self._in_h
+
+        return thumbnail, new_im, w_factor, h_factor
+
+    def _detect_prepared(self, prepared=None, start_time=None):
+        """Run inference on a batch of preprocessed images.
+
+        The input tensor batch size must match the number of images.
+
+        :Parameters:
+        ----------
+        prepared : list of tuples
+            _preprocess() results for each image in the batch.
+
+        :Returns:
+        -------
+        list of tuples
+            (thumbnail, new_im, inference_result) for each image.
 
-        tfe.set_tensor(tfe.input_details[0]['index'], input_data)
+        """
+        assert prepared
+        log.debug("Calling TF engine for inference")
+
+        tfe = self._tfengine
+
+        # write the input images directly into the input tensor buffer
+        # without intermediate copies.
+        # The tensor view must be released before invoking inference.
+        input_data = self._input_tensor()
+
+        for b, (thumbnail, new_im, w_factor, h_factor) in enumerate(prepared):
+            # Note: Floating models are not tested thoroughly yet.
+            # Its not clear yet whether floating models will be a good fit
+            # for Ambianic use cases. Optimized quantized models seem to do
+            # a good job in terms of accuracy and speed.
+            if tfe.is_quantized:
+                input_data[b] = new_im
+            else:  # pragma: no cover
+                # normalize floating point values with a single gather
+                # from the lookup table into the input tensor
+                np.take(self._norm_lut, np.asarray(new_im),
+                        out=input_data[b], mode='clip')
+        del input_data
 
         # invoke inference on the new input data
         # with the configured model
         tfe.infer()
 
-        self._log_stats(start_time=start_time)
-
-        # log.debug('output_details: %r', tfe.output_details)
-        # od = tfe.output_details[0]['index']
-        # log.debug('output_data[0]: %r',
-        #             tfe.get_tensor(od))
-        # log.debug('output_data[0]: %r',
-        #             tfe._tf_interpreter.get_tensor(od))
-
-        # get output tensor
-        boxes = tfe.get_tensor(tfe.output_details[0]['index'])
-        label_codes = tfe.get_tensor(
-            tfe.output_details[1]['index'])
-        scores = tfe.get_tensor(tfe.output_details[2]['index'])
-        num = tfe.get_tensor(tfe.output_details[3]['index'])
-        # log.warning('Detections:\n num: %r\n label_codes: %r\n scores: %r\n',
-        #             num, label_codes, scores)
-        # log.warning('Required confidence: %r',
-        #             tfe.confidence_threshold)
-        detections_count = int(num[0])
-
+        self._log_stats(start_time=start_time, frames=len(prepared))
+
+        # get output tensor views without copying.
+        # The views are only valid until the next inference,
+        # therefore they must not escape this method.
+        boxes, label_codes, scores, num = \
+            (output_tensor() for output_tensor in self._output_tensors)
+
+        results = []
+        for b, (thumbnail, new_im, w_factor, h_factor) in enumerate(prepared):
+            inference_result = self._get_inference_result(
+                boxes=boxes[b],
+                label_codes=label_codes[b],
+                scores=scores[b],
+                detections_count=int(num[b]),
+                w_factor=w_factor,
+                h_factor=h_factor)
+            log.debug('thumbnail image size: %r , '
+                      'tensor image size: %r',
+                      _image_size(thumbnail),
+                      _image_size(new_im))
+            results.append((thumbnail, new_im, inference_result))
+        return results
+
+    def _get_inference_result(self,
+                              boxes=None,
+                              label_codes=None,
+                              scores=None,
+                              detections_count=None,
+                              w_factor=None,
+                              h_factor=None):
+        """Convert raw detections of one image to labeled results."""
+        tfe = self._tfengine
+        label_codes, confidences, boxes = self._postprocess(
+            boxes,
+            label_codes,
+            scores,
+            detections_count,
+            tfe.top_k,
+            tfe.confidence_threshold,
+            w_factor,
+            h_factor)
         inference_result = []
-        # get a list of indices for the top_k results
-        # ordered from highest to lowest confidence.
-        # We are only interested in scores within detections_count range
-        indices_of_sorted_scores = np.argsort(scores[0, :detections_count])
-        # log.warning('Indices of sorted scores: %r:',
-        #             indices_of_sorted_scores)
-        top_k_indices = indices_of_sorted_scores[-1*tfe.top_k:][::-1]
-        # log.warning('Indices of top_k scores: %r:', top_k_indices)
-        # from the top_k results, only take the ones that score
-        # above the confidence threshold criteria.
-        for i in top_k_indices:
-            confidence = scores[0, i]
-            if confidence >= tfe.confidence_threshold:
-                # log.warning('Sample confidence: %r, required confidence %r',
-                #             confidence, tfe.confidence_threshold)
-                li = int(label_codes[0, i])
-                # protect against models that return arbitrary labels
-                # when the confidence is low
-                if (li < len(self._labels)):
-                    label = self._labels[li]
-                    box = boxes[0, i, :]
-                    # refit detections into original image size
-                    # without overflowing outside image borders
-                    x0 = box[1] / w_factor
-                    y0 = box[0] / h_factor
-                    x1 = min(box[3] / w_factor, 1)
-                    y1 = min(box[2] / h_factor, 1)
-                    log.debug('thumbnail image size: %r , '
-                              'tensor image size: %r',
-                              thumbnail.size,
-                              new_im.size)
-                    log.debug('resizing detection box (x0, y0, x1, y1) '
-                              'from: %r to %r',
-                              (box[1], box[0], box[3], box[2]),
-                              (x0, y0, x1, y1))
-                    inference_result.append((
-                        label,
-                        confidence,
-                        (x0, y0, x1, y1)))
-        return thumbnail, new_im, inference_result
+        labels = self._labels_arr
+        for li, confidence, (y0, x0, y1, x1) in zip(label_codes.tolist(),
+                                                    confidences,
+                                                    boxes):
+            # protect against models that return arbitrary labels
+            # when the confidence is low
+            if 0 <= li < len(labels) and labels[li] is not None:
+                label = labels[li]
+                inference_result.append((
+                    label,
+                    confidence,
+                    (x0, y0, x1, y1)))
+        return inference_result
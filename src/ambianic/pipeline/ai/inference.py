@@ -27,6 +27,20 @@ def _get_edgetpu_interpreter(model=None):  # pragma: no cover
     return tf_interpreter
 
 
+def _get_delegate_interpreter(model=None, delegate=None):
+    tf_interpreter = None
+    try:
+        tf_delegate = load_delegate(delegate)
+        tf_interpreter = Interpreter(
+            model_path=model,
+            experimental_delegates=[tf_delegate]
+            )
+        log.debug('TFLite delegate %r available. Will use it.', delegate)
+    except Exception as e:
+        log.warning('TFLite delegate %r init error: %r', delegate, e)
+    return tf_interpreter
+
+
 class TFInferenceEngine:
     """Thin wrapper around TFLite Interpreter.
 
@@ -41,7 +55,8 @@ class TFInferenceEngine:
                  model=None,
                  labels=None,
                  confidence_threshold=0.8,
-                 top_k=10
+                 top_k=10,
+                 delegate=None
                  ):
         """Create an instance of Tensorflow inference engine.
 
@@ -60,6 +75,16 @@ class TFInferenceEngine:
             Inference confidence threshold.
         top_k : type
             Inference top-k threshold.
+        delegate : string
+            Optional TFLite delegate to run the model with.
+            By default EdgeTPU is used when available.
+            'edgetpu' requires EdgeTPU and warns if it is not available.
+            'cpu' or 'xnnpack' skip EdgeTPU detection. Recent TFLite
+            runtime builds apply XNNPACK to the CPU runtime by default.
+            Any other value is loaded as a delegate shared library
+            for the TFLite model.
+            Falls back to TFLite CPU runtime if the delegate
+            cannot be loaded.
 
         """
         assert model
@@ -87,21 +112,40 @@ class TFInferenceEngine:
                   'EdgeTPU graph: %r\n'
                   'Labels %r.'
                   'Condidence threshod: %.0f%%'
-                  'top-k: %d',
+                  'top-k: %d\n'
+                  'Delegate: %r',
                   model_tflite,
                   model_edgetpu,
                   labels,
                   confidence_threshold*100,
-                  top_k)
+                  top_k,
+                  delegate)
         # EdgeTPU is not available in testing and other environments
         # load dynamically as needed
 #        edgetpu_class = 'DetectionEngine'
 #        module_object = import_module('edgetpu.detection.engine',
 #                                      packaage=edgetpu_class)
 #        target_class = getattr(module_object, edgetpu_class)
-        self._tf_interpreter = _get_edgetpu_interpreter(model=model_edgetpu)
+        self._tf_interpreter = None
+        if delegate in (None, 'edgetpu'):
+            self._tf_interpreter = \
+                _get_edgetpu_interpreter(model=model_edgetpu)
+            if not self._tf_interpreter:
+                if delegate:
+                    log.warning('EdgeTPU delegate requested '
+                                'but not available.')
+                log.debug('EdgeTPU not available. '
+                          'Will use TFLite CPU runtime.')
+        elif delegate in ('cpu', 'xnnpack'):
+            log.debug('Delegate %r configured. '
+                      'Will use TFLite CPU runtime.', delegate)
+        else:
+            self._tf_interpreter = _get_delegate_interpreter(
+                model=model_tflite, delegate=delegate)
+            if not self._tf_interpreter:
+                log.debug('TFLite delegate %r not available. '
+                          'Will use TFLite CPU runtime.', delegate)
         if not self._tf_interpreter:
-            log.debug('EdgeTPU not available. Will use TFLite CPU runtime.')
             self._tf_interpreter = Interpreter(model_path=model_tflite)
         assert self._tf_interpreter
         self._tf_interpreter.allocate_tensors()
@@ -110,6 +154,9 @@ class TFInferenceEngine:
         self._tf_output_details = self._tf_interpreter.get_output_details()
         self._tf_is_quantized_model = \
             self.input_details[0]['dtype'] != np.float32
+        # Many models have a fixed batch size of one.
+        # Find out on first attempt to resize.
+        self._tf_batch_resizable = True
 
     @property
     def input_details(self):
@@ -165,6 +212,38 @@ class TFInferenceEngine:
         """
         return self._top_k
 
+    def resize_batch(self, batch_size=None):
+        """Resize the input tensor to hold batch_size samples.
+
+        :Returns:
+        -------
+        bool
+            True if the model can run with the requested batch size.
+            Otherwise the input tensor shape remains unchanged.
+
+        """
+        assert batch_size > 0
+        input_shape = self.input_details[0]['shape']
+        if input_shape[0] == batch_size:
+            return True
+        if batch_size > 1 and not self._tf_batch_resizable:
+            return False
+        input_index = self.input_details[0]['index']
+        new_shape = [batch_size, *input_shape[1:]]
+        try:
+            self._tf_interpreter.resize_tensor_input(input_index, new_shape)
+            self._tf_interpreter.allocate_tensors()
+        except Exception as e:
+            log.debug('AI model does not support input shape %r: %r',
+                      new_shape, e)
+            self._tf_batch_resizable = False
+            self._tf_interpreter.resize_tensor_input(input_index, input_shape)
+            self._tf_interpreter.allocate_tensors()
+            return False
+        self._tf_input_details = self._tf_interpreter.get_input_details()
+        self._tf_output_details = self._tf_interpreter.get_output_details()
+        return True
+
     def infer(self):
         """Invoke model inference on current input tensor."""
         return self._tf_interpreter.invoke()
@@ -174,6 +253,15 @@ class TFInferenceEngine:
         assert isinstance(index, int)
         self._tf_interpreter.set_tensor(index, tensor_data)
 
+    def tensor(self, index=None):
+        """Return a function that gives a numpy view of tensor data.
+
+        Unlike get_tensor(), the view is not a copy and can be written to
+        directly. Do not hold on to the view itself across infer() calls.
+        """
+        assert isinstance(index, int)
+        return self._tf_interpreter.tensor(index)
+
     def get_tensor(self, index=None):
         """Return tensor data at given reference index."""
         assert isinstance(index, int)
@@ -5,6 +5,8 @@ import pathlib
 import json
 import uuid
 from typing import Iterable
+import numpy as np
+from PIL import Image
 
 from ambianic.pipeline import PipeElement
 
@@ -65,6 +67,18 @@ class SaveDetectionSamples(PipeElement):
         self._idle_interval = datetime.timedelta(seconds=ii)
         self._time_latest_saved_idle = self._time_latest_saved_detection
 
+    @staticmethod
+    def _save_image(image=None, path=None):
+        """Save PIL.Image, HxWx3 numpy array or JPEG bytes to path."""
+        if isinstance(image, (bytes, bytearray)):
+            # already JPEG encoded, no need to decode and encode again
+            with open(path, 'wb') as f:
+                f.write(image)
+        elif isinstance(image, np.ndarray):
+            Image.fromarray(image).save(path)
+        else:
+            image.save(path)
+
     def _save_sample(self,
                      inf_time=None,
                      image=None,
@@ -108,8 +122,8 @@ class SaveDetectionSamples(PipeElement):
             'inference_result': inf_json,
             'inference_meta': inference_meta
         }
-        image.save(image_path)
-        thumbnail.save(thumbnail_path)
+        self._save_image(image=image, path=image_path)
+        self._save_image(image=thumbnail, path=thumbnail_path)
         # save samples to local disk
         with open(json_path, 'w', encoding='utf-8') as f:
             json.dump(save_json, f, ensure_ascii=False, indent=4)
@@ -127,7 +141,7 @@ class SaveDetectionSamples(PipeElement):
         log.debug("Pipe element %s received new sample with keys %s.",
                   self.__class__.__name__,
                   str([*sample]))
-        if not image:
+        if image is None:
             # pass through empty samples to next element
             yield None
         else:
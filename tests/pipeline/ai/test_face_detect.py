@@ -1,7 +1,12 @@
 """Test face detection pipe element."""
 import os
+import json
+import logging
+import numpy as np
 from ambianic.pipeline.ai.object_detect import ObjectDetector
 from ambianic.pipeline.ai.face_detect import FaceDetector
+from ambianic.pipeline.store import SaveDetectionSamples
+from ambianic.pipeline.timeline import PipelineContext
 from ambianic.pipeline import PipeElement
 from PIL import Image
 
@@ -439,3 +444,70 @@ def test_one_person_no_face_two_stage():
     img = _get_image(file_name='person-no-face.jpg')
     object_detector.receive_next_sample(image=img)
     assert not result
+
+
+def test_crop_image_ndarray():
+    img = _get_image(file_name='person.jpg')
+    box = (-0.01, 0.1, 0.5, 0.6)
+    pil_crop = FaceDetector.crop_image(img, (0, 0.1, 0.5, 0.6))
+    crop = FaceDetector.crop_image(np.asarray(img), box)
+    assert isinstance(crop, np.ndarray)
+    assert crop.shape == (pil_crop.size[1], pil_crop.size[0], 3)
+    assert (crop == np.asarray(pil_crop)).all()
+
+
+def _store_pipe(tmp_path):
+    context = PipelineContext(unique_pipeline_name='test pipeline')
+    context.data_dir = str(tmp_path)
+    object_detector = ObjectDetector(**_object_detect_config())
+    face_detector = FaceDetector(**_face_detect_config())
+    store = SaveDetectionSamples(context=context,
+                                 event_log=logging.getLogger())
+    object_detector.connect_to_next_element(face_detector)
+    face_detector.connect_to_next_element(store)
+    return object_detector
+
+
+def _saved_samples(tmp_path):
+    saved = []
+    for json_path in tmp_path.glob('detections/*/*-inference.json'):
+        with open(json_path) as f:
+            saved.append(json.load(f))
+    return saved
+
+
+def test_ndarray_two_stage_pipe_store(tmp_path):
+    """Numpy array samples flow through detectors into storage."""
+    object_detector = _store_pipe(tmp_path)
+    img = np.asarray(_get_image(file_name='person-face.jpg'))
+    object_detector.receive_next_sample(image=img)
+    saved = _saved_samples(tmp_path)
+    assert len(saved) == 1
+    inf = saved[0]['inference_result']
+    assert len(inf) == 1
+    assert inf[0]['label'] == 'person'
+    assert inf[0]['confidence'] > 0.9
+    sample_dir = tmp_path / saved[0]['rel_dir']
+    image = Image.open(sample_dir / saved[0]['image_file_name'])
+    thumbnail = Image.open(sample_dir / saved[0]['thumbnail_file_name'])
+    assert image.mode == 'RGB'
+    assert thumbnail.mode == 'RGB'
+    assert image.size[0] < img.shape[1]
+
+
+def test_jpeg_bytes_two_stage_pipe_store(tmp_path):
+    """JPEG encoded samples flow through detectors into storage."""
+    object_detector = _store_pipe(tmp_path)
+    _dir = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(_dir, 'person-face.jpg'), 'rb') as f:
+        buf = f.read()
+    object_detector.receive_next_sample(image=buf)
+    saved = _saved_samples(tmp_path)
+    assert len(saved) == 1
+    inf = saved[0]['inference_result']
+    assert len(inf) == 1
+    assert inf[0]['label'] == 'person'
+    assert inf[0]['confidence'] > 0.9
+    sample_dir = tmp_path / saved[0]['rel_dir']
+    thumbnail = Image.open(sample_dir / saved[0]['thumbnail_file_name'])
+    assert thumbnail.mode == 'RGB'
@@ -1,9 +1,13 @@
 """Test image detection pipe element."""
+import logging
 import pytest
 import os
+import time
+import numpy as np
 from PIL import Image
 
 from ambianic.pipeline.ai.image_detection import TFImageDetection
+from ambianic.pipeline.ai.inference import TFInferenceEngine
 
 
 def test_inference_init_no_config():
@@ -111,6 +115,306 @@ def test_resize():
     assert new_height == new_size[1]
 
 
+def test_thumbnail():
+    config = _good_config()
+    img_detect = TFImageDetection(**config)
+    _dir = os.path.dirname(os.path.abspath(__file__))
+    img_path = os.path.join(_dir, 'background.jpg')
+    image = Image.open(img_path)
+    thumbnail = img_detect.thumbnail(image=image, desired_size=(300, 300))
+    assert thumbnail.size == (300, 169)
+    assert image.size == (1280, 720)
+    # same size rounding as PIL.Image.thumbnail
+    image = Image.new('RGB', (232, 320))
+    thumbnail = img_detect.thumbnail(image=image, desired_size=(300, 300))
+    assert thumbnail.size == (217, 300)
+    expected = image.copy()
+    expected.thumbnail((300, 300))
+    assert thumbnail.size == expected.size
+
+
+def _patch_input_dtype(monkeypatch, dtype):
+    input_details = TFInferenceEngine.input_details.fget
+
+    def _input_details(self):
+        details = [dict(d) for d in input_details(self)]
+        details[0]['dtype'] = dtype
+        return details
+    monkeypatch.setattr(TFInferenceEngine, 'input_details',
+                        property(_input_details))
+
+
+def test_float_model_rejected(monkeypatch):
+    config = _good_config()
+    _patch_input_dtype(monkeypatch, np.float32)
+    with pytest.raises(NotImplementedError, match='Floating point'):
+        TFImageDetection(**config)
+    # only uint8 and float32 input tensors are supported
+    _patch_input_dtype(monkeypatch, np.int8)
+    with pytest.raises(NotImplementedError, match='int8'):
+        TFImageDetection(**config)
+    with pytest.raises(NotImplementedError, match='int8'):
+        TFImageDetection(allow_float=True, **config)
+
+
+def test_float_model_allowed(monkeypatch):
+    _patch_input_dtype(monkeypatch, np.float32)
+    config = _good_config()
+    img_detect = TFImageDetection(allow_float=True, **config)
+    norm_lut = img_detect._norm_lut
+    assert norm_lut.dtype == np.float32
+    assert norm_lut.shape == (256,)
+    assert norm_lut[0] == -1.0
+    assert norm_lut[255] == 1.0
+
+
+def test_prepare_input():
+    config = _good_config()
+    img_detect = TFImageDetection(**config)
+    _dir = os.path.dirname(os.path.abspath(__file__))
+    img_path = os.path.join(_dir, 'background.jpg')
+    image = Image.open(img_path)
+    thumbnail, new_image = img_detect._prepare_input(
+        image=image, width=300, height=300)
+    # aspect ratio is preserved
+    assert thumbnail.size == (300, 169)
+    # padded to the exact input tensor size
+    assert new_image.shape == (300, 300, 3)
+    assert not new_image[169:].any()
+    # original image is not modified
+    assert image.size == (1280, 720)
+
+
+def test_detect_all():
+    config = _good_config()
+    config['confidence_threshold'] = 0.6
+    img_detect = TFImageDetection(**config)
+    _dir = os.path.dirname(os.path.abspath(__file__))
+    images = [Image.open(os.path.join(_dir, file_name))
+              for file_name in ('person.jpg', 'background.jpg', 'person.jpg')]
+    expected = [img_detect.detect(image=image)[2] for image in images]
+    detections = list(img_detect.detect_all(images=images))
+    assert len(detections) == 3
+    assert [inference_result for _, _, inference_result in detections] \
+        == expected
+    assert expected[0]
+    assert not expected[1]
+    assert not list(img_detect.detect_all(images=[]))
+    img_detect.stop()
+
+
+def test_detect_batch():
+    config = _good_config()
+    config['confidence_threshold'] = 0.6
+    img_detect = TFImageDetection(**config)
+    _dir = os.path.dirname(os.path.abspath(__file__))
+    images = [Image.open(os.path.join(_dir, file_name))
+              for file_name in ('person.jpg', 'background.jpg')]
+    expected = [img_detect.detect(image=image)[2] for image in images]
+    # the test model does not support batching,
+    # expect fallback to one image at a time
+    detections = img_detect.detect_batch(images=images)
+    assert len(detections) == 2
+    assert [inference_result for _, _, inference_result in detections] \
+        == expected
+    assert img_detect.detect_batch(images=[]) == []
+    img_detect.stop()
+
+
+def test_inference_result_top_k():
+    config = _good_config()
+    config['top_k'] = 2
+    config['confidence_threshold'] = 0.5
+    img_detect = TFImageDetection(**config)
+    scores = np.array([0.6, 0.9, 0.1, 0.7, 0.95], dtype=np.float32)
+    label_codes = np.array([0, 15, 0, 0, 0], dtype=np.float32)
+    boxes = np.tile(np.array([0.1, 0.2, 0.3, 0.4], dtype=np.float32), (5, 1))
+    # the last score is outside of the detections count range
+    result = img_detect._get_inference_result(
+        boxes=boxes,
+        label_codes=label_codes,
+        scores=scores,
+        detections_count=4,
+        w_factor=1.0,
+        h_factor=0.5)
+    assert len(result) == 2
+    assert [label for label, _, _ in result] == ['bird', 'person']
+    assert [confidence for _, confidence, _ in result] == \
+        [scores[1], scores[3]]
+    x0, y0, x1, y1 = result[0][2]
+    assert np.allclose((x0, y0, x1, y1), (0.2, 0.2, 0.4, 0.6))
+    result = img_detect._get_inference_result(
+        boxes=boxes,
+        label_codes=label_codes,
+        scores=scores,
+        detections_count=0,
+        w_factor=1.0,
+        h_factor=1.0)
+    assert result == []
+
+
+def test_prepare_input_ndarray_mild_downscale():
+    config = _good_config()
+    img_detect = TFImageDetection(**config)
+    image = np.full((400, 500, 3), 255, dtype=np.uint8)
+    thumbnail, new_image = img_detect._prepare_input(
+        image=image, width=300, height=300)
+    assert thumbnail.shape == (240, 300, 3)
+    assert (new_image[:240] == 255).all()
+    assert not new_image[240:].any()
+
+
+def test_decode():
+    config = _good_config()
+    img_detect = TFImageDetection(**config)
+    _dir = os.path.dirname(os.path.abspath(__file__))
+    img_path = os.path.join(_dir, 'person.jpg')
+    with open(img_path, 'rb') as f:
+        buf = f.read()
+    image = img_detect.decode(buf=buf)
+    assert isinstance(image, np.ndarray)
+    assert image.dtype == np.uint8
+    width, height = Image.open(img_path).size
+    assert image.shape == (height, width, 3)
+
+
+def test_prepare_input_ndarray():
+    config = _good_config()
+    img_detect = TFImageDetection(**config)
+    _dir = os.path.dirname(os.path.abspath(__file__))
+    img_path = os.path.join(_dir, 'background.jpg')
+    image = np.asarray(Image.open(img_path))
+    thumbnail, new_image = img_detect._prepare_input(
+        image=image, width=300, height=300)
+    assert thumbnail.shape == (169, 300, 3)
+    assert new_image.shape == (300, 300, 3)
+    assert new_image.dtype == np.uint8
+    # padded with black pixels
+    assert not new_image[169:].any()
+    assert image.shape == (720, 1280, 3)
+
+
+def test_detect_jpeg_bytes():
+    config = _good_config()
+    config['confidence_threshold'] = 0.6
+    img_detect = TFImageDetection(**config)
+    _dir = os.path.dirname(os.path.abspath(__file__))
+    img_path = os.path.join(_dir, 'person.jpg')
+    with open(img_path, 'rb') as f:
+        buf = f.read()
+    thumbnail, tensor_image, inference_result = img_detect.detect(image=buf)
+    assert isinstance(thumbnail, np.ndarray)
+    assert inference_result
+    label, confidence, (x0, y0, x1, y1) = inference_result[0]
+    assert label == 'person'
+    assert confidence > 0.9
+    assert x0 > 0 and x0 < x1
+    assert y0 > 0 and y0 < y1
+
+
+def test_detect_ndarray():
+    config = _good_config()
+    config['confidence_threshold'] = 0.6
+    img_detect = TFImageDetection(**config)
+    _dir = os.path.dirname(os.path.abspath(__file__))
+    img_path = os.path.join(_dir, 'person.jpg')
+    image = np.asarray(Image.open(img_path))
+    thumbnail, tensor_image, inference_result = img_detect.detect(image=image)
+    assert isinstance(thumbnail, np.ndarray)
+    assert tensor_image.shape == (300, 300, 3)
+    assert inference_result
+    label, confidence, (x0, y0, x1, y1) = inference_result[0]
+    assert label == 'person'
+    assert confidence > 0.9
+    assert x0 > 0 and x0 < x1
+    assert y0 > 0 and y0 < y1
+
+
+def test_detect_ndarray_bad_shape():
+    config = _good_config()
+    img_detect = TFImageDetection(**config)
+    with pytest.raises(AssertionError):
+        img_detect.detect(image=np.zeros((300, 300), dtype=np.uint8))
+    with pytest.raises(AssertionError):
+        img_detect.detect(image=np.zeros((300, 300, 3), dtype=np.float32))
+
+
+def test_postprocess_compile_error_fallback(monkeypatch, caplog):
+    pytest.importorskip('numba')
+    from ambianic.pipeline.ai import image_detection
+    py_func = image_detection._postprocess.py_func
+
+    def _broken_postprocess(*args):
+        raise TypeError('np.argpartition not supported')
+    _broken_postprocess.py_func = py_func
+    monkeypatch.setattr(image_detection, '_postprocess', _broken_postprocess)
+    config = _good_config()
+    config['confidence_threshold'] = 0.6
+    img_detect = TFImageDetection(**config)
+    assert img_detect._postprocess is py_func
+    assert 'Numba failed to compile' in caplog.text
+    _dir = os.path.dirname(os.path.abspath(__file__))
+    image = Image.open(os.path.join(_dir, 'person.jpg'))
+    thumbnail, tensor_image, inference_result = img_detect.detect(image=image)
+    assert inference_result
+    label, confidence, (x0, y0, x1, y1) = inference_result[0]
+    assert label == 'person'
+    assert confidence > 0.9
+
+
+def test_log_stats_rate_limited(caplog):
+    config = _good_config()
+    img_detect = TFImageDetection(**config)
+    _dir = os.path.dirname(os.path.abspath(__file__))
+    image = Image.open(os.path.join(_dir, 'person.jpg'))
+    caplog.set_level(logging.INFO)
+    # pretend the last stats log was long ago
+    img_detect._stats_log_time -= 10
+    img_detect.detect(image=image)
+    img_detect.detect(image=image)
+    stats = [r for r in caplog.records
+             if r.getMessage().startswith('Inference time')]
+    assert len(stats) == 1
+    assert img_detect._stats_frames == 1
+    # batch inference counts each image as a frame
+    img_detect._log_stats(start_time=time.monotonic(), frames=4)
+    assert img_detect._stats_frames == 5
+
+
+def test_detect_after_detect_batch():
+    config = _good_config()
+    config['confidence_threshold'] = 0.6
+    img_detect = TFImageDetection(**config)
+    tfe = img_detect._tfengine
+    resize_batch = tfe.resize_batch
+    batch_sizes = []
+
+    def _resize_batch(batch_size=None):
+        batch_sizes.append(batch_size)
+        return resize_batch(batch_size=batch_size)
+    tfe.resize_batch = _resize_batch
+    _dir = os.path.dirname(os.path.abspath(__file__))
+    image = Image.open(os.path.join(_dir, 'person.jpg'))
+    batch_results = img_detect.detect_batch(images=[image, image])
+    assert batch_sizes[0] == 2
+    batch_sizes.clear()
+    thumbnail, tensor_image, inference_result = img_detect.detect(image=image)
+    # detect() sets the input tensor back to a single sample
+    assert batch_sizes == [1]
+    assert tfe.input_details[0]['shape'][0] == 1
+    assert inference_result
+    for batch_thumbnail, batch_tensor_image, batch_inference_result \
+            in batch_results:
+        assert batch_thumbnail.size == thumbnail.size
+        assert np.array_equal(batch_tensor_image, tensor_image)
+        assert len(batch_inference_result) == len(inference_result)
+        for (label, confidence, box), (b_label, b_confidence, b_box) in \
+                zip(inference_result, batch_inference_result):
+            assert label == b_label
+            assert confidence == pytest.approx(b_confidence)
+            assert box == pytest.approx(b_box)
+
+
 def test_receive_next_sample():
     config = _good_config()
     img_detect = TFImageDetection(**config)
@@ -124,3 +428,10 @@ def test_load_labels():
     labels = img_detect._labels
     assert labels[0] == 'person'
     assert labels[15] == 'bird'
+    labels_arr = img_detect._labels_arr
+    assert labels_arr[0] == 'person'
+    assert labels_arr[15] == 'bird'
+    # coco label codes have gaps
+    assert 11 not in labels
+    assert labels_arr[11] is None
+    assert len(labels_arr) == max(labels) + 1
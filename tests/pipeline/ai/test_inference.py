@@ -1,3 +1,4 @@
+import logging
 import pytest
 import os
 
@@ -96,3 +97,66 @@ def test_inference_init_other_params():
     assert tf_engine.top_k == 678
     assert tf_engine.is_quantized
     assert tf_engine._model_labels_path == _good_labels()
+
+
+def test_inference_tensor_view():
+    model = {
+        'tflite':
+            _good_tflite_model(),
+    }
+    tf_engine = TFInferenceEngine(model=model, labels=_good_labels())
+    index = tf_engine.input_details[0]['index']
+    input_tensor = tf_engine.tensor(index)
+    input_data = input_tensor()
+    input_data[0, 0, 0, 0] = 123
+    del input_data
+    assert tf_engine.get_tensor(index)[0, 0, 0, 0] == 123
+
+
+def test_inference_init_cpu_delegate(caplog):
+    caplog.set_level(logging.DEBUG)
+    model = {
+        'tflite':
+            _good_tflite_model(),
+        'edgetpu':
+            _good_edgetpu_model(),
+    }
+    tf_engine = TFInferenceEngine(
+        model=model,
+        labels=_good_labels(),
+        delegate='cpu')
+    assert tf_engine
+    assert tf_engine._tf_interpreter
+    assert 'EdgeTPU not available' not in caplog.text
+    assert "Delegate 'cpu' configured" in caplog.text
+
+
+def test_inference_init_bad_delegate_fallback_cpu(caplog):
+    caplog.set_level(logging.DEBUG)
+    model = {
+        'tflite':
+            _good_tflite_model(),
+    }
+    tf_engine = TFInferenceEngine(
+        model=model,
+        labels=_good_labels(),
+        delegate='no_such_delegate.so')
+    assert tf_engine
+    assert tf_engine._tf_interpreter
+    assert 'EdgeTPU not available' not in caplog.text
+    assert "TFLite delegate 'no_such_delegate.so' not available" \
+        in caplog.text
+
+
+def test_inference_resize_batch_not_supported():
+    model = {
+        'tflite':
+            _good_tflite_model(),
+    }
+    tf_engine = TFInferenceEngine(model=model, labels=_good_labels())
+    assert tf_engine.resize_batch(1)
+    # SSD post processing requires a batch size of one
+    assert not tf_engine.resize_batch(4)
+    assert tf_engine.input_details[0]['shape'][0] == 1
+    assert not tf_engine.resize_batch(2)
+    tf_engine.infer()